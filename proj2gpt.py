@@ -9,17 +9,28 @@
 #   *_root - absolute path to file or folder
 #   *_nls - no leading slash
 
-import configparser
+import atexit
+import copy
+import fnmatch
 import hashlib
 import os
 import re
 import shutil
+import stat
 import sys
+import threading
+import time
 import unicodedata
-from collections import deque
+from bisect import bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from fnmatch import fnmatch
+from functools import lru_cache
+from itertools import accumulate
+from operator import itemgetter
 from textwrap import dedent
+from types import MappingProxyType
+from typing import NamedTuple
 
 #
 # GLOBALS
@@ -42,19 +53,41 @@ LOG_TMSG = 1
 LOG_TDIV = 2
 LOG_TSEP = 4
 
+LOG_BUFFER = 1 << 20
+
+_log_file = None  # buffered LOG_ROOT handle, opened on first write
+_log_lock = threading.Lock()
+
+def log_close():
+    """Flush and close the log file (it is reopened on the next write)."""
+    global _log_file
+    with _log_lock:
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+atexit.register(log_close)
+
+@lru_cache(maxsize=4)
+def _log_stamp(sec, date):
+    """Format a whole UTC second once for all messages logged within it."""
+    return time.strftime('%Y-%m-%d %H:%M:%S' if date else '%H:%M:%S', time.gmtime(sec))
+
 def log_output(message, type=LOG_TMSG, display=True, date=False):
+    global _log_file
     if display:
         print(message)
-    with open(LOG_ROOT, 'a', encoding='utf-8') as f:
-        if type != LOG_TMSG:
-            f.write(message+'\n')
-        else:
-            now = datetime.now(timezone.utc)
-            if date:
-                ts = f"[{now:%Y-%m-%d %H:%M:%S}.{now.microsecond//1000:03d} Z] "
-            else:
-                ts = f"[{now:%H:%M:%S}.{now.microsecond//1000:03d} Z] "
-            f.write(f'{ts}{message}\n')
+    if type != LOG_TMSG:
+        line = message + '\n'
+    else:
+        sec, ms = divmod(int(time.time() * 1000), 1000)
+        line = f'[{_log_stamp(sec, date)}.{ms:03d} Z] {message}\n'
+    with _log_lock:
+        if _log_file is None or _log_file.name != LOG_ROOT:  # first write or log moved
+            if _log_file is not None:
+                _log_file.close()
+            _log_file = open(LOG_ROOT, 'a', encoding='utf-8', buffering=LOG_BUFFER)
+        _log_file.write(line)
 
 def log_divider(display=True):
     log_output('='*20, LOG_TDIV, display)
@@ -74,20 +107,34 @@ def rm_leading_slash(path):
 
 def op_normpath(path): return os.path.normpath(path)
 def op_normjoin(*paths): return op_normpath(os.path.join(*paths))
-def op_absjoin(*paths): return os.path.abspath(op_normjoin(*paths))
+def op_absjoin(*paths): return os.path.abspath(os.path.join(*paths))  # abspath normalizes
+
+_MKDIR_CACHE = set()  # folders already created by this process
 
-def bool2str(b): return 'Yes' if b else 'No'
+def op_makedirs(path):
+    if path not in _MKDIR_CACHE:
+        if not os.path.isdir(path):  # one stat instead of makedirs' stat/mkdir/stat
+            os.makedirs(path, exist_ok=True)
+        _MKDIR_CACHE.add(path)
+
+bool2str = {True: 'Yes', False: 'No'}.__getitem__
 def str2bool(s): return str(s).strip().lower() in ('1', 'true', 'yes', 'on')
 
+_NATSORT_RE = re.compile(r'(\d+)')
+
+@lru_cache(maxsize=4096)
+def _natsort_fold(p):
+    return unicodedata.normalize('NFKD', p).casefold()
+
+@lru_cache(maxsize=4096)
 def natsort_key(s):
-    parts = re.split(r'(\d+)', s)
     key = []
-    for p in parts:
+    for p in _NATSORT_RE.split(s):
         if p.isdigit():
             key.append((0, int(p)))
-        else:
-            key.append((1, unicodedata.normalize('NFKD', p).casefold()))
-    return key
+        else:  # text parts (e.g. path prefixes) repeat across keys
+            key.append((1, _natsort_fold(p)))
+    return tuple(key)
 
 def list_dirs(path):
     """Return a list of subfolder names in the given path."""
@@ -100,11 +147,10 @@ def list_dirs(path):
     except OSError:
         return []
 
-def gitignore2masks(dir_root, dir_path):
-    file_root = op_normjoin(dir_root, '.gitignore')
+def gitignore2masks(file_root, dir_path):
+    """Read masks from the .gitignore file_root found in folder dir_path."""
     masks = []
-    if not os.path.isfile(file_root):
-        return masks
+    dir_anchor = OS_SEP + dir_path + OS_SEP if dir_path else OS_SEP
 
     with open(file_root, encoding="utf-8") as git_file:
         for line in git_file:
@@ -113,18 +159,61 @@ def gitignore2masks(dir_root, dir_path):
                 continue
 
             if mask.startswith(('/', '\\')):  # anchored mask (rel. to this .gitignore dir)
-                mask = rm_leading_slash(mask)
-                if dir_path:
-                    full = op_normjoin(OS_SEP + dir_path, mask)
-                else:
-                    full = OS_SEP + mask
-            else:                             # non-anchored mask
-                full = mask
+                mask = dir_anchor + rm_leading_slash(mask)
 
-            masks.append(op_normpath(full))
+            masks.append(op_normpath(mask))  # normalized once, at load time
 
     return masks
 
+MASK_FLAGS = re.IGNORECASE if os.path.normcase('A') == 'a' else 0  # as fnmatch()
+
+@lru_cache(maxsize=512)
+def _mask_pattern(mask):
+    return '(?:%s)' % fnmatch.translate(os.path.normcase(mask))
+
+def masks2regex(masks):
+    """Compile fnmatch-style masks into one alternation regex, None if no masks."""
+    if not masks:
+        return None
+    pattern = '|'.join(map(_mask_pattern, masks))  # inherited masks are translated once
+    return re.compile(pattern, MASK_FLAGS)
+
+class MaskSet(NamedTuple):
+    """Masks grouped by the cheapest test that decides them, see masks2matchers()."""
+    suffixes: tuple       # '*<literal>'  -> name.endswith()
+    prefixes: tuple       # '<literal>*'  -> name.startswith()
+    path_prefixes: tuple  # '/<literal>*' -> path.startswith()
+    regex: object         # other masks, masks2regex() result or None
+
+_MASK_BUCKETS_RE = (  # (pattern, MaskSet field index); literals hold no wildcards
+    (re.compile(r'\*([^*?[/\\]+)'), 0),
+    (re.compile(r'([^*?[/\\]+)\*'), 1),
+    (re.compile(r'([/\\][^*?[]*)\*'), 2),
+)
+
+def masks2matchers(masks):
+    """Split masks into a MaskSet: plain suffix/prefix masks become normcased
+    tuples for str.endswith()/startswith(), the rest is compiled by masks2regex()."""
+    buckets = ([], [], [])
+    rest = []
+    for mask in masks:
+        for mask_re, index in _MASK_BUCKETS_RE:
+            m = mask_re.fullmatch(mask)
+            if m:
+                buckets[index].append(os.path.normcase(m.group(1)))
+                break
+        else:
+            rest.append(mask)
+    return MaskSet(*map(tuple, buckets), masks2regex(rest))
+
+def masks_match(masks, name, path, name_case, path_case):
+    """Check a file/folder name and its OS_SEP-prefixed path against a MaskSet;
+    *_case are the same strings lowercased when MASK_FLAGS (done once by caller)."""
+    return (name_case.endswith(masks.suffixes)
+            or name_case.startswith(masks.prefixes)
+            or path_case.startswith(masks.path_prefixes)
+            or (masks.regex is not None and (masks.regex.match(name) or masks.regex.match(path))))
+
 #
 # INTRO
 #
@@ -154,75 +243,165 @@ TOC_NAME = 'toc.txt'
 INS_NAME = '_instructions.txt'
 DFF_NAME = '_diff.txt'
 
-DEFAULTS = {
-    'SETTINGS': {
+DEFAULTS = MappingProxyType({  # read-only, copied by _read_ini()
+    'SETTINGS': MappingProxyType({
         'debug': '0',    # log debug information
         'verbose': '1',  # show status & progress information
         'build_keep_count': '5',  # how many builds to keep, 0 = unlimited
         'log_rewrite': '1',       # start a new log each run; True disables max_log_lines
         'max_log_lines': '50000',
-    },
-    'PROJECT': {
+    }),
+    'PROJECT': MappingProxyType({
         'project_title': 'Common',
         'project_descr': 'Working on the project',
         'group_paths': '',    # <group_path1>[, <group_path2> ...]
         'group_roots': '',    # <group_root1>[, <group_root2> ...]
         'auto_secrets': '1',  # auto replace everything to <name>.gpt
-    },
-    'TRAVERSAL': {
+    }),
+    'TRAVERSAL': MappingProxyType({
         'names_allowed': '*.cfg,*.conf,*.css,*.html,*.ini,*.js,*.json,*.md,*.php,*.py,*.txt,*.xml',
         'names_ignored': '.git*,/logs*,/temp*,/test*',
         'use_gitignore': '1',
         'max_file_size': '1000000',  # bytes
-    },
-    'GENERATOR': {
+    }),
+    'GENERATOR': MappingProxyType({
         'dest_path': '/proj2gpt',
         'max_text_size': '3000000',  # bytes
-    },
-}
+    }),
+})
+
+_INI_ENTRY_RE = re.compile(
+    r'^(?:\[(?P<section>[^\]]+)\]\s*(?:[;#].*)?'     # [SECTION] ; comment
+    r'|(?P<key>[^=:\s][^=:]*?)\s*[=:](?P<value>.*))$'  # key = value
+)
+_INI_COMMENT_RE = re.compile(r'\s+[;#](?:\s.*)?$')  # inline comment: whitespace, marker, whitespace
+
+def _read_ini(text):
+    """Parse INI text over DEFAULTS into a {section: {key: value}} dict.
+
+    Supports full-line and inline comments, '=' or ':' delimiters and indented
+    continuation lines (values are joined with newlines). Keys are lowercased.
+    """
+    cfg = {section: dict(options) for section, options in DEFAULTS.items()}
+    section = key = None
+
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(('#', ';')):
+            continue
 
-def _parse_ini_list(s):
-    s = (s or '').strip()
-    items = [x.strip() for x in re.split(r'[,\n]+', s) if x.strip()]
-    return [op_normpath(x) for x in items]
+        if line[:1].isspace() and key is not None:  # continuation line
+            cfg[section][key] += '\n' + _INI_COMMENT_RE.sub('', stripped)
+            continue
 
-def load_config(proj_root):
+        m = _INI_ENTRY_RE.match(stripped)
+        if not m:
+            raise ValueError(f'{INI_NAME}, line {line_num}: cannot parse {stripped!r}')
 
-    global DEBUG, LOG_ROOT
+        if m.group('section'):
+            section = sys.intern(m.group('section').strip())
+            cfg.setdefault(section, {})
+            key = None
+        elif section is None:
+            raise ValueError(f'{INI_NAME}, line {line_num}: option outside of section')
+        else:
+            key = sys.intern(m.group('key').lower())  # same object as the literal keys
+            cfg[section][key] = _INI_COMMENT_RE.sub('', m.group('value')).strip()
 
-    ini_path = op_normjoin(proj_root, INI_NAME)
+    return cfg
+
+_BOOLMAP = {
+    '1': True, 'yes': True, 'true': True, 'on': True,
+    '0': False, 'no': False, 'false': False, 'off': False,
+}
 
-    cp = configparser.ConfigParser()
-    cp.read_dict(DEFAULTS)
-    if os.path.isfile(ini_path):
-        cp.read(ini_path, encoding='utf-8')
+def _cfg_bool(section, key):
+    value = section[key]
+    try:
+        return _BOOLMAP[value.lower()]
+    except KeyError:
+        raise ValueError(f'{key}: not a boolean: {value!r}') from None
+
+_NL_TO_COMMA = str.maketrans('\n', ',')
+_GLOB_CHARS_RE = re.compile(r'[*?[]')
+
+def _norm_mask(mask):
+    """Normalize separators of a glob mask without normpath() ('*/..' must not fold)."""
+    mask = mask.replace('\\', '/')
+    while mask.startswith('./'):
+        mask = mask[2:]
+    mask = mask.rstrip('/') or mask
+    return mask.replace('/', OS_SEP)
+
+@lru_cache(maxsize=64)
+def _parse_ini_list(s):
+    """Split a comma/newline separated INI value; returns a tuple (cached)."""
+    items = (x.strip() for x in (s or '').translate(_NL_TO_COMMA).split(','))
+    return tuple(_norm_mask(x) if _GLOB_CHARS_RE.search(x) else op_normpath(x) for x in items if x)
+
+def _cfg_to_settings(cfg):
+    """Convert parsed INI sections into typed settings values."""
+
+    s_cfg, p_cfg, t_cfg, g_cfg = (cfg['SETTINGS'], cfg['PROJECT'],
+                                  cfg['TRAVERSAL'], cfg['GENERATOR'])
 
     settings = {}
-    settings['project_root'] = proj_root
 
     # SETTINGS
-    settings['debug'] = cp.getboolean('SETTINGS', 'debug')
-    settings['verbose'] = cp.getboolean('SETTINGS', 'verbose')
-    settings['build_keep_count'] = cp.getint('SETTINGS', 'build_keep_count')
-    settings['log_rewrite'] = cp.getboolean('SETTINGS', 'log_rewrite')
-    settings['max_log_lines'] = cp.getint('SETTINGS', 'max_log_lines')
+    settings['debug'] = _cfg_bool(s_cfg, 'debug')
+    settings['verbose'] = _cfg_bool(s_cfg, 'verbose')
+    settings['build_keep_count'] = int(s_cfg['build_keep_count'])
+    settings['log_rewrite'] = _cfg_bool(s_cfg, 'log_rewrite')
+    settings['max_log_lines'] = int(s_cfg['max_log_lines'])
 
     # PROJECT
-    settings['project_title'] = cp.get('PROJECT', 'project_title')
-    settings['project_descr'] = cp.get('PROJECT', 'project_descr')
-    settings['group_paths'] = _parse_ini_list(cp.get('PROJECT', 'group_paths'))
-    settings['group_roots'] = _parse_ini_list(cp.get('PROJECT', 'group_roots'))
-    settings['auto_secrets'] = cp.getboolean('PROJECT', 'auto_secrets')
+    settings['project_title'] = p_cfg['project_title']
+    settings['project_descr'] = p_cfg['project_descr']
+    settings['group_paths'] = list(_parse_ini_list(p_cfg['group_paths']))
+    settings['group_roots'] = list(_parse_ini_list(p_cfg['group_roots']))
+    settings['auto_secrets'] = _cfg_bool(p_cfg, 'auto_secrets')
 
     # TRAVERSAL
-    settings['names_allowed'] = _parse_ini_list(cp.get('TRAVERSAL', 'names_allowed'))
-    settings['names_ignored'] = _parse_ini_list(cp.get('TRAVERSAL', 'names_ignored'))
-    settings['use_gitignore'] = cp.getboolean('TRAVERSAL', 'use_gitignore')
-    settings['max_file_size'] = cp.getint('TRAVERSAL', 'max_file_size')
+    settings['names_allowed'] = list(_parse_ini_list(t_cfg['names_allowed']))
+    settings['names_ignored'] = list(_parse_ini_list(t_cfg['names_ignored']))
+    settings['use_gitignore'] = _cfg_bool(t_cfg, 'use_gitignore')
+    settings['max_file_size'] = int(t_cfg['max_file_size'])
 
     # GENERATOR
-    settings['dest_path'] = op_normpath(cp.get('GENERATOR', 'dest_path').strip())
-    settings['max_text_size'] = cp.getint('GENERATOR', 'max_text_size')
+    settings['dest_path'] = op_normpath(g_cfg['dest_path'])
+    settings['max_text_size'] = int(g_cfg['max_text_size'])
+
+    return settings
+
+_DEFAULT_SETTINGS = _cfg_to_settings(_read_ini(''))  # used when there is no INI file
+
+_SETTINGS_CACHE = {}  # (ini_path, mtime_ns, size) -> parsed settings
+
+def _read_config(ini_path):
+    """Return settings parsed from the INI file (or defaults), cached by file stats."""
+    try:
+        with open(ini_path, 'rb') as ini_file:
+            st = os.fstat(ini_file.fileno())
+            cache_key = (ini_path, st.st_mtime_ns, st.st_size)
+            cached = _SETTINGS_CACHE.get(cache_key)
+            if cached is None:
+                text = ini_file.read().decode('utf-8')
+    except FileNotFoundError:
+        return copy.deepcopy(_DEFAULT_SETTINGS)
+
+    if cached is None:
+        cached = _SETTINGS_CACHE[cache_key] = _cfg_to_settings(_read_ini(text))
+
+    return copy.deepcopy(cached)
+
+def load_config(proj_root):
+
+    global DEBUG, LOG_ROOT
+
+    ini_path = op_normjoin(proj_root, INI_NAME)
+
+    settings = _read_config(ini_path)
+    settings['project_root'] = proj_root
 
     # set global debug mode
     DEBUG = settings['debug']
@@ -241,42 +420,68 @@ def load_config(proj_root):
     settings['names_ignored'].append(settings['dest_path'] + '*')
     settings['names_ignored'].append('*.gpt')
 
+    # compile masks once per run
+    settings['names_allowed_masks'] = masks2matchers(settings['names_allowed'])
+    settings['names_ignored_masks'] = masks2matchers(settings['names_ignored'])
+
     # set log root to destination folder
     LOG_ROOT = os.path.join(settings['dest_root'], LOG_NAME)
 
     # delete old log if log_rewrite == True
+    log_close()
     if settings['log_rewrite'] and os.path.isfile(LOG_ROOT):
         os.remove(LOG_ROOT)
 
     return settings
 
+_SUMMARY_FMT = '''SETTINGS:
+ [S] debug: %s
+ [S] verbose: %s
+ [S] build_keep_count: %s
+ [S] log_rewrite: %s
+ [S] max_log_lines: %s
+ [P] project_root: %s
+ [P] project_title: %s
+ [P] project_descr: %s
+ [P] group_paths: %s
+ [P] group_roots: %s
+ [P] auto_secrets: %s
+ [T] names_allowed: %s
+ [T] names_ignored: %s
+ [T] use_gitignore: %s
+ [T] max_file_size: %s
+ [G] dest_path: %s
+ [G] dest_root: %s
+ [G] context_name: %s
+ [G] context_path: %s
+ [G] context_root: %s
+ [G] max_text_size: %s'''
+
 def summarize_settings(settings):
 
-    lines = [
-        'SETTINGS:',
-        ' [S] debug: %s' % bool2str(settings['debug']),
-        ' [S] verbose: %s' % bool2str(settings['verbose']),
-        ' [S] build_keep_count: %s' % settings['build_keep_count'],
-        ' [S] log_rewrite: %s' % bool2str(settings['log_rewrite']),
-        ' [S] max_log_lines: %s' % settings['max_log_lines'],
-        ' [P] project_root: %s' % settings['project_root'],
-        ' [P] project_title: %s' % settings['project_title'],
-        ' [P] project_descr: %s' % settings['project_descr'],
-        ' [P] group_paths: %s' % (', '.join(settings['group_paths']) if settings['group_paths'] else '<none>'),
-        ' [P] group_roots: %s' % (', '.join(settings['group_roots']) if settings['group_roots'] else '<none>'),
-        ' [P] auto_secrets: %s' % bool2str(settings['auto_secrets']),
-        ' [T] names_allowed: %s' % (', '.join(settings['names_allowed']) if settings['names_allowed'] else '<none>'),
-        ' [T] names_ignored: %s' % (', '.join(settings['names_ignored']) if settings['names_ignored'] else '<none>'),
-        ' [T] use_gitignore: %s' % bool2str(settings['use_gitignore']),
-        ' [T] max_file_size: %s' % settings['max_file_size'],
-        ' [G] dest_path: %s' % (settings['dest_path']),
-        ' [G] dest_root: %s' % (settings['dest_root']),
-        ' [G] context_name: %s' % (settings['context_name']),
-        ' [G] context_path: %s' % (settings['context_path']),
-        ' [G] context_root: %s' % (settings['context_root']),
-        ' [G] max_text_size: %s' % settings['max_text_size'],
-    ]
-    return '\n'.join(lines)
+    return _SUMMARY_FMT % (
+        bool2str(settings['debug']),
+        bool2str(settings['verbose']),
+        settings['build_keep_count'],
+        bool2str(settings['log_rewrite']),
+        settings['max_log_lines'],
+        settings['project_root'],
+        settings['project_title'],
+        settings['project_descr'],
+        ', '.join(settings['group_paths']) or '<none>',
+        ', '.join(settings['group_roots']) or '<none>',
+        bool2str(settings['auto_secrets']),
+        ', '.join(settings['names_allowed']) or '<none>',
+        ', '.join(settings['names_ignored']) or '<none>',
+        bool2str(settings['use_gitignore']),
+        settings['max_file_size'],
+        settings['dest_path'],
+        settings['dest_root'],
+        settings['context_name'],
+        settings['context_path'],
+        settings['context_root'],
+        settings['max_text_size'],
+    )
 
 #
 # COLLECTING DATA
@@ -312,16 +517,14 @@ def group_roots_to_paths(proj_root, settings):
             continue
         roots_seen.add(_rel_root)
         try:
-            entries = sorted(os.listdir(group_root), key=str.casefold)
+            with os.scandir(group_root) as root_items:  # folders only, not symlinks (no extra stats)
+                entries = sorted((e.name for e in root_items if e.is_dir(follow_symlinks=False)),
+                                 key=str.casefold)
         except PermissionError:
             log_message(f'Error: Access denied to: {_rel_root} ({group_root})')
             continue
         for group_name in entries:
-            sub_group_root = op_normjoin(group_root, group_name)
-            if (os.path.islink(sub_group_root)       # symlink
-             or not os.path.isdir(sub_group_root)):  # not folder
-                continue
-            sub_group_path = op_normjoin(_rel_root, group_name)
+            sub_group_path = os.path.join(_rel_root, group_name)  # _rel_root is normalized
             if sub_group_path not in paths_seen:
                 group_paths.append(sub_group_path)
                 paths_seen.add(sub_group_path)
@@ -332,12 +535,27 @@ def group_roots_to_paths(proj_root, settings):
 def gpath_to_fname(group_path):
     return 'group' + group_path.replace(OS_SEP, '__')
 
+class FileRec(NamedTuple):
+    """Collected file: one per file allowed into the context."""
+    dir_name: str
+    dir_path: str
+    dir_root: str
+    file_name: str
+    file_stem: str
+    file_ext: str
+    file_path: str
+    file_root: str
+    file_size: int
+    is_symlink: bool
+    stub_root: str  # <stem>.gpt next to the file, None if absent
+
+WALK_WORKERS = 8  # threads walking top-level subfolders
+
 def traverse(settings, proj_root):
 
     global DEBUG
 
     group_paths = settings['group_paths']
-    names_allowed = settings['names_allowed']
     names_ignored = settings['names_ignored']
 
     groups = {                    # 1st (root) group
@@ -352,104 +570,147 @@ def traverse(settings, proj_root):
             'files': []
         }
 
-    def rel_to_root(dir_root): return os.path.relpath(dir_root, proj_root)
+    allowed_masks = settings['names_allowed_masks']
+    auto_secrets = settings['auto_secrets']
+
+    # group paths, longest first: a nested group wins over its parent group
+    group_prefixes = [(gpath, gpath + OS_SEP) for gpath in
+                      sorted((g for g in groups if g != DEF_GROUP_PATH), key=len, reverse=True)]
+    group_starts = tuple(gpath for gpath, _ in group_prefixes)  # one C-level test for most folders
+
+    def scan_dir(item, group_files, debug_log):
+        """Collect files of one folder into group_files, return its subfolder items.
+        Items: (dir_root, parent .gitignore masks, parent ignored MaskSet)."""
 
-    def walk(dir_root: str, _parent_git_masks=None):
-        if _parent_git_masks is None:
-            _parent_git_masks = []
+        dir_root, parent_git_masks, parent_ignored_masks = item
 
-        dir_path = '' if dir_root == proj_root else rel_to_root(dir_root)
+        dir_path = '' if dir_root == proj_root else os.path.relpath(dir_root, proj_root)
         dir_name = os.path.basename(dir_root)
+        dir_path_sep = dir_path + OS_SEP if dir_path else ''  # prefixes for file paths
+        dir_root_sep = os.path.join(dir_root, '')
+
+        if dir_path:  # filter subfolder against its parent's masks
+            dpath = OS_SEP + dir_path
+            dname_case, dpath_case = (dir_name.lower(), dpath.lower()) if MASK_FLAGS else (dir_name, dpath)
+            if masks_match(parent_ignored_masks, dir_name, dpath, dname_case, dpath_case):
+                if DEBUG:
+                    debug_log(f'Ignored: {dpath}')
+                return []
 
         files, dirs = [], []
+        gitignore_root = None
+        stub_names, stub_names_lower = set(), set()  # *.gpt stubs of this folder (auto_secrets only)
         with os.scandir(dir_root) as dir_items:
             for dir_item in dir_items:
+                name_lower = dir_item.name.lower()  # once per entry: sort key, mask & stub tests
                 if dir_item.is_file(follow_symlinks=False):
-                    files.append(dir_item)
+                    files.append((name_lower, dir_item))
                 elif dir_item.is_dir(follow_symlinks=False):
-                    dirs.append(dir_item)
-
-        files.sort(key=lambda e: e.name.lower())
-        dirs.sort(key=lambda e: e.name.lower())
+                    dirs.append((name_lower, dir_item))
+                if dir_item.name == '.gitignore' and dir_item.is_file():  # may be a symlink
+                    gitignore_root = dir_item.path
+                if auto_secrets and name_lower.endswith('.gpt') and dir_item.is_file():  # stubs may be symlinks
+                    stub_names.add(dir_item.name)
+                    stub_names_lower.add(name_lower)
+
+        files.sort(key=itemgetter(0))  # stable, entries are never compared
+        dirs.sort(key=itemgetter(0))
+
+        # define group (shared by all files of this folder)
+
+        group_path = DEF_GROUP_PATH
+        dir_full = OS_SEP + dir_path
+        if dir_full.startswith(group_starts):  # candidate, resolve the exact group
+            for gpath, gpath_sep in group_prefixes:
+                if dir_full == gpath or dir_full.startswith(gpath_sep):
+                    group_path = gpath
+                    break
 
-        gmasks = gitignore2masks(dir_root, dir_path)
-        local_git = gmasks if settings['use_gitignore'] else []
-        names_ignored_git = _parent_git_masks + local_git
-        names_ignored_full = names_ignored + names_ignored_git
+        local_git = []
+        if gitignore_root and settings['use_gitignore']:
+            local_git = gitignore2masks(gitignore_root, dir_path)
+        names_ignored_git = parent_git_masks + local_git
+        if local_git:  # recompile only when this folder adds masks
+            ignored_masks = masks2matchers(names_ignored + names_ignored_git)
+        else:
+            ignored_masks = parent_ignored_masks
 
-        for e in files:
+        for name_lower, e in files:
 
-            fpath = op_normjoin(OS_SEP + dir_path, e.name)
+            file_path = dir_path_sep + e.name  # both parts are already normalized
+            fpath = OS_SEP + file_path
+            name_case, path_case = (name_lower, fpath.lower()) if MASK_FLAGS else (e.name, fpath)
 
             #
             # filter
 
-            allowed_file = any(fnmatch(e.name, mask) for mask in names_allowed)
-            allowed_path = any(fnmatch(fpath, mask) for mask in names_allowed)
-
-            ignored_file = any(fnmatch(e.name, mask) for mask in names_ignored_full)
-            ignored_path = any(fnmatch(fpath, mask) for mask in names_ignored_full)
-
-            if not allowed_file and not allowed_path:
-                file_path = op_normjoin(dir_path, e.name)
+            if not masks_match(allowed_masks, e.name, fpath, name_case, path_case):
                 if DEBUG:
-                    log_message(f'Skipped: {OS_SEP}{file_path}', display=False)
+                    debug_log(f'Skipped: {fpath}')
                 continue
 
-            if ignored_file or ignored_path:
-                file_path = op_normjoin(dir_path, e.name)
+            if masks_match(ignored_masks, e.name, fpath, name_case, path_case):  # only for allowed files
                 if DEBUG:
-                    log_message(f'Ignored: {OS_SEP}{file_path}', display=False)
+                    debug_log(f'Ignored: {fpath}')
                 continue
 
-            #
-            # define group
-
-            group_path = DEF_GROUP_PATH
-            for gpath in groups:
-                if gpath == DEF_GROUP_PATH:
-                    continue
-                if (OS_SEP + dir_path).startswith(gpath):
-                    group_path = gpath
-                    break
-
             #
             # collect data
 
-            file_stem, file_ext = os.path.splitext(e.name)
-            if file_ext.startswith('.'):
-                file_ext = file_ext[1:]
-
-            file_stats = e.stat(follow_symlinks=False)
-
-            groups[group_path]['files'].append({
-                'dir_name': dir_name,
-                'dir_path': dir_path,
-                'dir_root': dir_root,
-                'file_name': e.name,
-                'file_stem': file_stem,
-                'file_ext': file_ext,
-                'file_path': op_normjoin(dir_path, e.name),
-                'file_root': op_normjoin(dir_root, e.name),
-                'file_size': file_stats.st_size,
-                'file_hash': None,
-                'is_symlink': e.is_symlink(),
-            })
-
-        for d in dirs:
-
-            dpath = op_normjoin(OS_SEP + dir_path, d.name)
-            ignored_name = any(fnmatch(d.name, mask) for mask in names_ignored_full)
-            ignored_path = any(fnmatch(dpath, mask) for mask in names_ignored_full)
-
-            if ignored_name or ignored_path:
-                if DEBUG:
-                    log_message(f'Ignored: {dpath}', display=False)
-                continue
-
-            walk(d.path, names_ignored_git)
+            file_stem, _, file_ext = e.name.rpartition('.')
+            if not file_stem.strip('.'):  # no dot or leading dots only, as splitext()
+                file_stem, file_ext = e.name, ''
+            file_ext = sys.intern(file_ext)  # a few dozen distinct values, one object each
+
+            file_stats = e.stat(follow_symlinks=False)  # only for files that passed filters
+
+            stub_name = file_stem + '.gpt'
+            stub_root = dir_root_sep + stub_name
+            if stub_name not in stub_names:  # case-insensitive file systems only, as isfile() did
+                if stub_name.lower() not in stub_names_lower or not os.path.isfile(stub_root):
+                    stub_root = None
+
+            group_files[group_path].append(FileRec(
+                dir_name=dir_name,
+                dir_path=dir_path,
+                dir_root=dir_root,
+                file_name=e.name,
+                file_stem=file_stem,
+                file_ext=file_ext,
+                file_path=file_path,
+                file_root=dir_root_sep + e.name,
+                file_size=file_stats.st_size,
+                is_symlink=stat.S_ISLNK(file_stats.st_mode),
+                stub_root=stub_root,
+            ))
+
+        return [(d.path, names_ignored_git, ignored_masks) for _, d in dirs]
+
+    def walk(item):
+        """Depth-first walk of one subtree (on a worker thread): (group_files, debug_lines)."""
+        group_files, debug_lines = defaultdict(list), []
+        stack = deque([item])
+        while stack:
+            # pop() takes the last item, so push in reverse to keep sorted order
+            stack.extend(reversed(scan_dir(stack.pop(), group_files, debug_lines.append)))
+        return group_files, debug_lines
+
+    # project root first, then its subtrees in parallel (scandir/stat release the GIL);
+    # shards are merged in walk order, so results match a sequential depth-first walk
+
+    root_files, root_lines = defaultdict(list), []
+    top_items = scan_dir((proj_root, [], settings['names_ignored_masks']), root_files, root_lines.append)
+
+    shards = [(root_files, root_lines)]
+    with ThreadPoolExecutor(max_workers=WALK_WORKERS) as executor:
+        shards.extend(executor.map(walk, top_items))
+
+    for group_files, debug_lines in shards:
+        for line in debug_lines:
+            log_message(line, display=False)
+        for group_path, files in group_files.items():
+            groups[group_path]['files'].extend(files)
 
-    walk(proj_root)
     return groups
 
 def groups_limiter(groups, settings):
@@ -458,44 +719,41 @@ def groups_limiter(groups, settings):
 
     def add_new_group(path, name, files, chunk_num):
         if chunk_num > 0:
-            path += ' (' + str(chunk_num) + ')'
-            name += '__' + str(chunk_num).zfill(2)
+            path = f'{path} ({chunk_num})'
+            name = f'{name}__{chunk_num:02d}'
         new_groups[path] = {'name': name, 'files': files}
 
+    max_text_size = settings['max_text_size']
+    size_limit = min(settings['max_file_size'], max_text_size)
+
     for group_path, group_data in groups.items():
 
         group_name = group_data['name']
 
-        chunk_size = 0
-        chunk_num = 0
-        chunk_files = []
-
+        files = []
         for file_data in group_data['files']:
-
-            file_size = file_data['file_size']
-            file_path = file_data['file_path']
-
-            if (file_size > settings['max_file_size']
-             or file_size > settings['max_text_size']):
+            if file_data.file_size > size_limit:
                 if DEBUG:
-                    log_message(f'Notice: Skipped by size ({file_size}), file {OS_SEP}{file_path}', display=False)
+                    log_message(f'Notice: Skipped by size ({file_data.file_size}), file {OS_SEP}{file_data.file_path}', display=False)
                 continue
+            files.append(file_data)
 
-            if chunk_size > 0 and chunk_size + file_size > settings['max_text_size']:
-
-                # create new group chunk
-                chunk_size = 0    # reset
-                chunk_num += 1    # inc
-                add_new_group(group_path, group_name, chunk_files, chunk_num)
-                chunk_files = []  # reset
+        # split into chunks: each ends before the file that would exceed max_text_size
 
-            chunk_size += file_size
-            chunk_files.append(file_data)
+        cum_sizes = list(accumulate(f.file_size for f in files))
+        chunk_bounds = []
+        start = 0
+        while start < len(files):
+            base = cum_sizes[start - 1] if start else 0
+            end = bisect_right(cum_sizes, base + max_text_size, start + 1)
+            chunk_bounds.append((start, end))
+            start = end
 
-        if chunk_files:
-            if chunk_num > 0:  # the last chunk in the series
-                chunk_num += 1
-            add_new_group(group_path, group_name, chunk_files, chunk_num)
+        if len(chunk_bounds) == 1:
+            add_new_group(group_path, group_name, files, 0)
+        else:
+            for chunk_num, (start, end) in enumerate(chunk_bounds, start=1):
+                add_new_group(group_path, group_name, files[start:end], chunk_num)
 
     return new_groups
 
@@ -503,91 +761,103 @@ def groups_limiter(groups, settings):
 # GENERATING OUTPUT
 #
 
-def sha256_10(text):
-    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]
+def sha256_10(data):
+    return hashlib.sha256(data).hexdigest()[:10]
 
-def generate_containers(groups, settings):
+_is_ascii = getattr(bytes, 'isascii', lambda data: False)  # Python 3.7+
 
-    context_name = settings['context_name']
-    context_path = settings['context_path']
-    context_root = settings['context_root']
-    os.makedirs(context_root, exist_ok=True)
-    global_toc = ''
+READ_WORKERS = 8  # threads reading source files ahead of the container writer
 
-    for group_path, group_data in groups.items():
+def read_source(file_data, settings):
+    """Return (body, hash10): normalized UTF-8 bytes of the file (or its *.gpt
+    stub), or a marker text if the file is empty or cannot be read/decoded."""
 
-        container_name = group_data['name'] + '.txt'
-        container_path = op_normjoin(context_path, container_name)
-        container_root = op_normjoin(context_root, container_name)
+    srce_root = file_data.file_root
 
-        container_toc = f'\nGROUP ORIG_PATH: "{group_path}"; CONTAINER: "{container_name}"\n'
-        container_txt = ''
-        container_ofs = 0
+    if settings['auto_secrets'] and file_data.stub_root:  # substitute <stem>.gpt stub found by traverse()
+        if os.access(file_data.stub_root, os.R_OK):
+            srce_root = file_data.stub_root
 
-        group_file = open(container_root,
-                         mode='w',
-                         encoding='utf-8',
-                         buffering=64*1024,
-                         newline='\n')
+    # read file content as bytes, validate as UTF-8
 
-        for file_data in group_data['files']:
+    try:
+        with open(srce_root, 'rb', buffering=0) as srce_file:  # raw FileIO, readall() sizes by fstat
+            body = srce_file.read()
+        if not _is_ascii(body):  # ASCII is valid UTF-8, no decode needed
+            body.decode('utf-8', errors='strict')  # validation only
+    except OSError as e:
+        log_message(f'I/O error {srce_root}: {e}', display=False)
+        body = b'[## ERROR: FILE CANNOT BE READ DUE TO I/O ERROR! ##]'
+    except UnicodeDecodeError as e:
+        log_message(f'Decode error in {srce_root}: {e}', display=False)
+        body = b'[## ERROR: FILE CANNOT BE READ DUE TO UNICODE DECODING ERROR! ##]'
+
+    # normalize line breaks (CR/LF bytes never occur inside UTF-8 sequences)
+
+    if b'\r' in body:  # LF-only files need no pass at all
+        body = body.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if not body:
+        body = b'[## NOTE: EMPTY FILE ##]'
+
+    return body, sha256_10(body)
 
-            stub_name = file_data['file_stem'] + '.gpt'
-            stub_root = op_normjoin(file_data['dir_root'], stub_name)
-            stub_exists = os.path.isfile(stub_root) and os.access(stub_root, os.R_OK)
+def generate_containers(groups, settings):
 
-            file_root = file_data['file_root']
+    context_name = settings['context_name']
+    context_path = settings['context_path']
+    context_root = settings['context_root']
+    op_makedirs(context_root)
+    toc_lines = [f'TOC BUILD: {context_name}\n']
 
-            srce_root = stub_root if settings['auto_secrets'] and stub_exists else file_root
+    def read_one(file_data): return read_source(file_data, settings)
 
-            # read file content, decode as UTF-8
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
 
-            srce_file = open(srce_root, 'rb')
-            try:
-                file_content = srce_file.read().decode('utf-8', errors='strict')
-            except OSError as e:
-                log_message(f'I/O error {srce_root}: {e}', display=False)
-                file_content = '[## ERROR: FILE CANNOT BE READ DUE TO I/O ERROR! ##]'
-            except UnicodeDecodeError as e:
-                log_message(f'Decode error in {srce_root}: {e}', display=False)
-                file_content = '[## ERROR: FILE CANNOT BE READ DUE TO UNICODE DECODING ERROR! ##]'
-            finally:
-                srce_file.close()
+        for group_path, group_data in groups.items():
 
-            # normalize line breaks
+            container_name = group_data['name'] + '.txt'
+            container_path = op_normjoin(context_path, container_name)
+            container_root = op_normjoin(context_root, container_name)
 
-            file_content = file_content.replace('\r\n','\n').replace('\r','\n')
-            if not file_content:
-                file_content = '[## NOTE: EMPTY FILE ##]'
+            toc_group_idx = len(toc_lines)
+            toc_lines.append(None)  # group line is filled in when the container is done
+            group_hashes = []
+            container_ofs = 0
 
-            # add content frames
+            group_buff = bytearray()  # whole container, written at once
 
-            hash10 = sha256_10(file_content)
-            head = f'[## BEGIN FILE: "{OS_SEP}{file_data["file_path"]}" ##]\n'
-            foot = f'\n[## END FILE: "{OS_SEP}{file_data["file_path"]}" ##]\n'
-            file_content = head + file_content + foot
+            # files are read in parallel, written in order
+            group_files = group_data['files']
+            for file_data, (body, hash10) in zip(group_files, executor.map(read_one, group_files)):
 
-            f_size = len(file_content.encode('utf-8'))
-            container_toc += f'FILE PATH: "{OS_SEP}{file_data["file_path"]}"; OFFSET: {container_ofs}; SIZE: {f_size}; HASH: {hash10}\n'
-            container_ofs += f_size
+                # add content frames
 
-            container_txt += file_content
+                head = f'[## BEGIN FILE: "{OS_SEP}{file_data.file_path}" ##]\n'.encode('utf-8')
+                foot = f'\n[## END FILE: "{OS_SEP}{file_data.file_path}" ##]\n'.encode('utf-8')
 
-        global_toc += container_toc
+                f_size = len(head) + len(body) + len(foot)
+                toc_lines.append(f'FILE PATH: "{OS_SEP}{file_data.file_path}"; OFFSET: {container_ofs}; SIZE: {f_size}; HASH: {hash10}\n')
+                container_ofs += f_size
+                group_hashes.append(hash10)
 
-        group_file.write(container_txt)
-        group_file.close()
+                group_buff += head
+                group_buff += body
+                group_buff += foot
 
-        log_message(f'Created: {container_name}')
+            with open(container_root, mode='wb') as group_file:
+                group_file.write(group_buff)
 
-    # write global TOC
+            group_hash = toc_group_hash(group_hashes)
+            toc_lines[toc_group_idx] = (f'\nGROUP ORIG_PATH: "{group_path}"; CONTAINER: "{container_name}"; '
+                                        f'SIZE: {container_ofs}; HASH: {group_hash}\n')
 
-    global_toc_title = f'TOC BUILD: {context_name}\n'
-    global_toc = global_toc_title + global_toc
+            log_message(f'Created: {container_name}')
+
+    # write global TOC
 
     toc_root = op_normjoin(settings['context_root'], TOC_NAME)
     with open(toc_root, 'w', encoding='utf-8', newline='\n') as toc_file:
-        toc_file.write(global_toc)
+        toc_file.write(''.join(toc_lines))
 
     log_message(f'Created: {TOC_NAME}')
 
@@ -636,6 +906,17 @@ def generate_instructions(groups, settings):
 
     log_message(f'Created: {INS_NAME}')
 
+TOC_GROUP_RE = re.compile(r'^GROUP ORIG_PATH:\s*"([^"]*)";\s*CONTAINER:\s*"([^"]*)"'
+                          r'(?:;\s*SIZE:\s*\d+;\s*HASH:\s*([0-9a-fA-F]+))?')
+TOC_FILE_RE = re.compile(r'^FILE PATH:\s*"[^"]*";\s*OFFSET:\s*\d+;'
+                         r'\s*SIZE:\s*\d+;\s*HASH:\s*([0-9a-fA-F]+)')
+
+def toc_group_hash(file_hashes):
+    h = hashlib.sha256()
+    for file_hash in sorted(file_hashes):
+        h.update(file_hash.encode('ascii'))
+    return h.hexdigest()[:10]
+
 def diff_toc_parse(toc_path):
     data = dict()
 
@@ -653,10 +934,7 @@ def diff_toc_parse(toc_path):
                 continue
 
             if line.startswith('GROUP ORIG_PATH:'):
-                m = re.match(
-                    r'^GROUP ORIG_PATH:\s*"([^"]*)";\s*CONTAINER:\s*"([^"]*)"',
-                    line
-                )
+                m = TOC_GROUP_RE.match(line)
                 if not m:
                     continue
 
@@ -668,22 +946,23 @@ def diff_toc_parse(toc_path):
                     'hashes': [],
                 }
                 data[group_path] = current_group
+
+                # group hash stored in header, no need to parse its files
+                if m.group(3):
+                    current_group['hash'] = m.group(3)
+                    current_group = None
                 continue
 
-            if line.startswith('FILE PATH:') and current_group is not None:
-                m = re.match(
-                    r'^FILE PATH:\s*"[^"]*";\s*OFFSET:\s*\d+;'
-                    r'\s*SIZE:\s*\d+;\s*HASH:\s*([0-9a-fA-F]+)',
-                    line
-                )
+            if current_group is not None and line.startswith('FILE PATH:'):
+                m = TOC_FILE_RE.match(line)
                 if m:
                     file_hash = m.group(1)
                     current_group['hashes'].append(file_hash)
 
+    # older TOC format: hash the group from its files
     for group in data.values():
-        group['hashes'].sort()
-        hashes_str = ''.join(group['hashes'])
-        group['hash'] = sha256_10(hashes_str)
+        if 'hash' not in group:
+            group['hash'] = toc_group_hash(group['hashes'])
 
     return data
 
@@ -766,6 +1045,7 @@ def cleanup_builds(settings):
         if (index > build_keep_count     # build is redundant
         and os.path.isdir(build_root)):  # and is dir..
             shutil.rmtree(build_root)
+            _MKDIR_CACHE.discard(build_root)
             del_count += 1
             log_message(f'Removed: /{build_name}')
 
@@ -779,6 +1059,8 @@ def cleanup_log(settings):
 
     max_lines = settings['max_log_lines']
 
+    log_close()  # flush pending lines before the log is read back
+
     if settings['log_rewrite']:
         return  # trimming not needed for fresh log
 
@@ -787,20 +1069,39 @@ def cleanup_log(settings):
     if not os.path.isfile(LOG_ROOT):
         return
 
-    lines = deque(maxlen=max_lines)
+    buf_size = 1024*1024
 
-    src = open(LOG_ROOT, 'r', encoding='utf-8', errors='replace')
-    try:
-        for line in src:
-            lines.append(line)
-    finally:
-        src.close()
+    with open(LOG_ROOT, 'rb') as src:
 
-    dst = open(TMP_ROOT, 'w', encoding='utf-8', newline='')
-    try:
-        dst.writelines(lines)
-    finally:
-        dst.close()
+        def chunks(): return iter(lambda: src.read(buf_size), b'')
+
+        # 1st pass: count lines
+
+        skip_lines = sum(chunk.count(b'\n') for chunk in chunks()) - max_lines
+        if skip_lines <= 0:
+            return
+
+        # 2nd pass: find the offset of the first line to keep
+
+        src.seek(0)
+        keep_ofs = 0
+        for chunk in chunks():
+            chunk_lines = chunk.count(b'\n')
+            if chunk_lines < skip_lines:
+                skip_lines -= chunk_lines
+                keep_ofs += len(chunk)
+                continue
+            pos = -1
+            for _ in range(skip_lines):
+                pos = chunk.index(b'\n', pos + 1)
+            keep_ofs += pos + 1
+            break
+
+        # copy the tail
+
+        src.seek(keep_ofs)
+        with open(TMP_ROOT, 'wb') as dst:
+            shutil.copyfileobj(src, dst, buf_size)
 
     os.replace(TMP_ROOT, LOG_ROOT)
 
@@ -814,7 +1115,7 @@ def main():
     settings = load_config(proj_root)
     verbose = settings['verbose']
 
-    os.makedirs(settings['dest_root'], exist_ok=True)
+    op_makedirs(settings['dest_root'])
 
     log_divider(display=False)
     log_message(f'START {__app__} v{__version__}', display=False, date=True)